@@ -1,11 +1,316 @@
 import requests
+import base64
+import hashlib
+import itertools
 import json
 import os
+import re
+import subprocess
+import tempfile
+import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+import numpy as np
+from moviepy.config import get_setting
 from moviepy.editor import *
+from PIL import Image, ImageDraw, ImageFont
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Tuple, List
 
+# Faster JSON handling when available; stdlib json is used otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Stability AI allows 150 requests per 10 seconds
+API_RATE_LIMIT = 15  # requests per second
+MAX_IMAGE_WORKERS = 8
+MAX_BATCH_SAMPLES = 4  # largest efficient batch for 1024x1024 SDXL
+HTTP_POOL_SIZE = 16
+STATUS_CACHE_TTL = 60  # seconds
+STATUS_FAILURE_TTL = 5  # seconds; retry soon after a failed or unreachable check
+CAPTION_DURATION = 3  # seconds each action caption stays on screen
+MIN_SCENE_DURATION = 5  # seconds
+CAPTION_FONT = "DejaVuSans.ttf"
+CAPTION_FONT_SIZE = 30
+CAPTION_PADDING = 10  # pixels between the caption text and its box edge
+CAPTION_MARGIN = 100  # total horizontal space left beside a caption box
+# One match per non-blank script line; exactly one group is set unless the
+# line is a comment
+SCRIPT_LINE_PATTERN = re.compile(
+    r"^[^\S\n]*(?:"
+    r"SCENE:(?P<scene>.*)"
+    r"|CHARACTER:(?P<character>.*)"
+    r"|(?:#|//).*"
+    r"|(?P<action>\S.*?)"
+    r")[^\S\n]*$",
+    re.M
+)
+
+NVENC_FFMPEG_PARAMS = ["-b:v", "10000k", "-preset", "p4", "-rc", "vbr"]
+NVENC_MAX_SESSIONS = 3  # concurrent encodes allowed by consumer NVIDIA drivers
+
+
+@lru_cache(maxsize=None)
+def _nvenc_available() -> bool:
+    """Check once whether ffmpeg can encode with NVIDIA's h264_nvenc."""
+    # Listing encoders is not enough: nvenc is often compiled in without a GPU,
+    # so run a tiny probe encode with the same settings real encodes use
+    # (the p1-p7 presets need a recent ffmpeg and driver)
+    try:
+        result = subprocess.run(
+            [
+                get_setting("FFMPEG_BINARY"), "-hide_banner", "-loglevel", "error",
+                "-f", "lavfi", "-i", "color=c=black:s=256x256:d=0.1",
+                "-c:v", "h264_nvenc", *NVENC_FFMPEG_PARAMS,
+                "-pix_fmt", "yuv420p", "-f", "null", "-"
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=30
+        )
+        return result.returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+def _video_encoder_params() -> dict:
+    """Keyword arguments for write_videofile, preferring hardware encoding."""
+    if _nvenc_available():
+        # MoviePy only adds -pix_fmt yuv420p for libx264; without it NVENC would
+        # keep the RGB frames as 4:4:4, which many players cannot decode
+        return {
+            "codec": "h264_nvenc",
+            "ffmpeg_params": NVENC_FFMPEG_PARAMS + ["-pix_fmt", "yuv420p"]
+        }
+    return {
+        "codec": "libx264",
+        "preset": "ultrafast",
+        "threads": os.cpu_count(),
+        "ffmpeg_params": ["-tune", "stillimage"]
+    }
+
+
+def _cache_key(scene_description: str, resolution: Tuple[int, int]) -> str:
+    """Content hash of everything that determines a generated image."""
+    params = f"{scene_description}|{resolution}|sdxl-1024-v1|cfg7|steps30"
+    return hashlib.sha256(params.encode()).hexdigest()
+
+
+def _write_atomic(path: str, chunks):
+    """Write chunks of bytes to `path` via a temporary file and rename.
+    
+    Concurrent readers never see a partially written file, and the temporary
+    file is removed if writing fails.
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _json_loads(data: bytes):
+    """Parse JSON bytes with orjson if installed, falling back to the json module."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj) -> bytes:
+    """Serialize to JSON bytes with orjson if installed, falling back to the json module."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+
+def _ffmpeg_encoder_args(use_nvenc: bool, threads: int) -> List[str]:
+    """Encoder arguments for direct ffmpeg invocations, matching _video_encoder_params."""
+    if use_nvenc:
+        return ["-c:v", "h264_nvenc"] + NVENC_FFMPEG_PARAMS
+    return [
+        "-c:v", "libx264", "-preset", "ultrafast", "-tune", "stillimage",
+        "-threads", str(threads)
+    ]
+
+
+def _run_ffmpeg(args: List[str]):
+    """Run ffmpeg with the given arguments, raising on failure."""
+    result = subprocess.run(
+        [get_setting("FFMPEG_BINARY"), "-y", "-hide_banner", "-loglevel", "error"] + args,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg failed: {result.stderr.strip()}")
+
+
+@lru_cache(maxsize=None)
+def _caption_font(fontsize: int):
+    """Load the caption font once per size."""
+    try:
+        return ImageFont.truetype(CAPTION_FONT, fontsize)
+    except OSError:
+        return ImageFont.load_default(size=fontsize)
+
+
+@lru_cache(maxsize=256)
+def _render_caption_image(
+    text: str,
+    width: int,
+    fontsize: int = CAPTION_FONT_SIZE
+) -> Image.Image:
+    """Render a caption as white text on a translucent black box.
+    
+    Results are cached, so callers must not modify the returned image.
+    """
+    font = _caption_font(fontsize)
+    measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    max_text_width = width - 2 * CAPTION_PADDING
+    
+    # Greedy word wrap to the box width
+    lines = []
+    for word in text.split():
+        candidate = f"{lines[-1]} {word}" if lines else word
+        if lines and measure.textlength(candidate, font=font) <= max_text_width:
+            lines[-1] = candidate
+        else:
+            lines.append(word)
+    wrapped = "\n".join(lines)
+    
+    left, top, right, bottom = measure.multiline_textbbox(
+        (0, 0), wrapped, font=font, align="center"
+    )
+    height = (bottom - top) + 2 * CAPTION_PADDING
+    image = Image.new("RGBA", (width, height), (0, 0, 0, 128))
+    ImageDraw.Draw(image).multiline_text(
+        ((width - (right - left)) / 2 - left, CAPTION_PADDING - top),
+        wrapped,
+        font=font,
+        fill="white",
+        align="center"
+    )
+    return image
+
+
+def _load_scene_background(
+    image_path: str,
+    resolution: Tuple[int, int]
+) -> Image.Image:
+    """Decode a scene image as RGBA, sized to the output resolution."""
+    background = Image.open(image_path).convert("RGBA")
+    if background.size != tuple(resolution):
+        background = background.resize(resolution)
+    return background
+
+
+def _burn_caption(background: Image.Image, caption: Image.Image) -> np.ndarray:
+    """Composite a caption at the bottom center of a frame, returning RGB pixels."""
+    frame = background.copy()
+    frame.alpha_composite(
+        caption,
+        dest=((frame.width - caption.width) // 2, frame.height - caption.height)
+    )
+    return np.array(frame.convert("RGB"))
+
+
+def _scene_duration(scene: dict) -> int:
+    """Length of a scene in seconds: one caption slot per action, minimum 5 seconds."""
+    return max(len(scene["actions"]) * CAPTION_DURATION, MIN_SCENE_DURATION)
+
+
+def _render_scene_ffmpeg(
+    png_path: str,
+    actions: List[str],
+    duration: float,
+    out_path: str,
+    fps: int,
+    caption_width: int,
+    encoder_args: List[str]
+):
+    """Render a still image with timed action captions straight to an MP4."""
+    # The still is read once per second and duplicated up to the output rate
+    # by the fps filter, instead of ffmpeg decoding the PNG for every frame
+    inputs = ["-loop", "1", "-framerate", "1", "-t", str(duration), "-i", png_path]
+    filters = [f"[0:v]fps={fps}[v0]"]
+    label = "v0"
+    for i, action in enumerate(actions):
+        caption_path = f"{out_path}.caption_{i}.png"
+        _render_caption_image(action, caption_width).save(caption_path)
+        inputs += ["-i", caption_path]
+        
+        start = i * CAPTION_DURATION
+        end = start + CAPTION_DURATION
+        filters.append(
+            f"[{label}][{i + 1}:v]overlay=x=(W-w)/2:y=H-h"
+            f":enable='gte(t,{start})*lt(t,{end})'[v{i + 1}]"
+        )
+        label = f"v{i + 1}"
+    filters.append(f"[{label}]format=yuv420p[out]")
+    
+    _run_ffmpeg(
+        inputs
+        + ["-filter_complex", ";".join(filters), "-map", "[out]", "-r", str(fps)]
+        + encoder_args
+        + [out_path]
+    )
+
+
+def _concat_videos_ffmpeg(video_paths: List[str], out_path: str):
+    """Join identically encoded videos with the concat demuxer (no re-encode)."""
+    list_path = f"{out_path}.concat.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in video_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    
+    try:
+        _run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", out_path])
+    finally:
+        os.remove(list_path)
+
+
+class _RateLimiter:
+    """Token bucket limiting how many requests are issued per second."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._last) * self.rate
+                )
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
 class StabilityAnimationGenerator:
     def __init__(self):
         """Initialize the Stability AI animation generator."""
@@ -13,13 +318,51 @@ class StabilityAnimationGenerator:
         self.api_key = os.getenv("STABILITY_API_KEY")
         self.base_url = "https://api.stability.ai"
         self.output_dir = "generated_animations"
-        os.makedirs(self.output_dir, exist_ok=True)
+        self.cache_dir = os.path.join(self.output_dir, ".cache")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._rate_limiter = _RateLimiter(API_RATE_LIMIT)
+        
+        # Shared session so all requests (across threads) reuse keep-alive connections
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(
+            pool_connections=HTTP_POOL_SIZE,
+            pool_maxsize=HTTP_POOL_SIZE,
+            # Rate limiting (429) and transient server errors are retried with
+            # exponential backoff, waiting for Retry-After when it is sent
+            max_retries=Retry(
+                total=5,
+                backoff_factor=1.0,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=["GET", "POST"],
+                respect_retry_after_header=True
+            )
+        ))
+        
+        self._status_cache = {"ok": None, "ts": 0}
+        self._status_lock = threading.Lock()
         
+        # Request pieces that never change between image generations
+        engine_id = "stable-diffusion-xl-1024-v1-0"
+        self._text_to_image_url = f"{self.base_url}/v1/generation/{engine_id}/text-to-image"
+        self._headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            # A single image can be returned as raw PNG bytes instead of base64
+            "Accept": "image/png"
+        }
+        self._batch_headers = {**self._headers, "Accept": "application/json"}
+        self._base_payload = {
+            "cfg_scale": 7,
+            "samples": 1,
+            "steps": 30,
+            "style_preset": "animation"
+        }
+
     def check_api_status(self) -> bool:
         """Check if Stability AI API is operational."""
         try:
-            response = requests.get("https://stabilityai.instatus.com/summary.json")
-            status_data = response.json()
+            response = self.session.get("https://stabilityai.instatus.com/summary.json")
+            status_data = _json_loads(response.content)
             
             # Check if API is UP and there are no major outages
             is_up = status_data["page"]["status"] == "UP"
@@ -36,63 +379,173 @@ class StabilityAnimationGenerator:
     def check_components_status(self) -> bool:
         """Check if API components are operational."""
         try:
-            response = requests.get("https://stabilityai.instatus.com/v2/components.json")
-            components = response.json()
-            
-            # Check if all components are operational
-            return all(comp["status"] == "OPERATIONAL" for comp in components)
+            with self.session.get(
+                "https://stabilityai.instatus.com/v2/components.json",
+                stream=ijson is not None
+            ) as response:
+                if ijson is not None:
+                    # Stream the statuses and stop reading at the first failure
+                    response.raw.decode_content = True
+                    statuses = ijson.items(response.raw, "item.status")
+                else:
+                    statuses = (comp["status"] for comp in _json_loads(response.content))
+                
+                # Check if all components are operational
+                return all(status == "OPERATIONAL" for status in statuses)
         except Exception as e:
             print(f"Failed to check components status: {e}")
             return False
     
+    def _api_healthy(self) -> bool:
+        """Return the combined API/components status.
+        
+        Healthy results are cached for STATUS_CACHE_TTL, failures only for
+        STATUS_FAILURE_TTL so a one-off failed check does not sink every scene.
+        """
+        with self._status_lock:
+            ttl = STATUS_CACHE_TTL if self._status_cache["ok"] else STATUS_FAILURE_TTL
+            if time.time() - self._status_cache["ts"] < ttl:
+                return self._status_cache["ok"]
+            
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                api_ok = executor.submit(self.check_api_status)
+                components_ok = executor.submit(self.check_components_status)
+                ok = api_ok.result() and components_ok.result()
+            
+            self._status_cache = {"ok": ok, "ts": time.time()}
+            return ok
+    
     def generate_scene_image(
         self, 
         scene_description: str, 
         resolution: Tuple[int, int] = (1024, 1024)
     ) -> str:
         """Generate an image using Stability AI API."""
-        if not self.check_api_status() or not self.check_components_status():
+        image_path = self._cache_path(scene_description, resolution)
+        if os.path.exists(image_path):
+            return image_path
+        
+        if not self._api_healthy():
             raise Exception("Stability AI API is currently experiencing issues")
-            
-        engine_id = "stable-diffusion-xl-1024-v1-0"
-        api_endpoint = f"{self.base_url}/v1/generation/{engine_id}/text-to-image"
         
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
+        try:
+            self._request_images(scene_description, resolution, [image_path])
+            return image_path
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Image generation failed: {str(e)}")
+    
+    def generate_scene_images_batch(
+        self,
+        descriptions: List[str],
+        resolution: Tuple[int, int] = (1024, 1024)
+    ) -> List[str]:
+        """Generate one image per description, batching repeated prompts.
+        
+        The text-to-image endpoint blends multiple text prompts into a single
+        image, so only identical descriptions can share a request (as extra
+        samples). Returns image paths in the same order as `descriptions`.
+        """
+        groups = {}
+        for i, description in enumerate(descriptions):
+            groups.setdefault(description, []).append(i)
         
+        image_paths = [None] * len(descriptions)
+        missing = {}
+        for description, indices in groups.items():
+            # Repeats of a prompt are distinct samples, each cached separately
+            for sample, i in enumerate(indices):
+                image_paths[i] = self._cache_path(description, resolution, sample)
+                if not os.path.exists(image_paths[i]):
+                    missing.setdefault(description, []).append(image_paths[i])
+        
+        if missing and not self._api_healthy():
+            raise Exception("Stability AI API is currently experiencing issues")
+        
+        for description, paths in missing.items():
+            for start in range(0, len(paths), MAX_BATCH_SAMPLES):
+                chunk = paths[start:start + MAX_BATCH_SAMPLES]
+                try:
+                    self._request_images(description, resolution, chunk)
+                except requests.exceptions.HTTPError as e:
+                    status = e.response.status_code if e.response is not None else None
+                    if status is None or status == 429 or not 400 <= status < 500:
+                        raise Exception(f"Image generation failed: {str(e)}")
+                    # Batch rejected, fall back to one request per image
+                    for path in chunk:
+                        try:
+                            self._request_images(description, resolution, [path])
+                        except requests.exceptions.RequestException as e:
+                            raise Exception(f"Image generation failed: {str(e)}")
+                except requests.exceptions.RequestException as e:
+                    raise Exception(f"Image generation failed: {str(e)}")
+        
+        return image_paths
+    
+    def _cache_path(
+        self,
+        scene_description: str,
+        resolution: Tuple[int, int],
+        sample: int = 0
+    ) -> str:
+        """Location of the cached image for a prompt in the image cache."""
+        key = _cache_key(scene_description, resolution)
+        if sample:
+            key = f"{key}_{sample}"
+        return os.path.join(self.cache_dir, f"{key}.png")
+    
+    def _request_images(
+        self,
+        scene_description: str,
+        resolution: Tuple[int, int],
+        image_paths: List[str]
+    ):
+        """Request one image per path for a prompt and save them to those paths."""
+        samples = len(image_paths)
+        headers = self._headers if samples == 1 else self._batch_headers
         data = {
+            **self._base_payload,
+            "width": resolution[0],
+            "height": resolution[1],
+            "samples": samples,
             "text_prompts": [
                 {
                     "text": f"{scene_description}, animation style, high quality, detailed",
                     "weight": 1
                 }
-            ],
-            "cfg_scale": 7,
-            "width": resolution[0],
-            "height": resolution[1],
-            "samples": 1,
-            "steps": 30,
-            "style_preset": "animation"
+            ]
         }
         
-        try:
-            response = requests.post(api_endpoint, headers=headers, json=data)
-            response.raise_for_status()
-            
-            # Save the generated image
-            image_data = response.json()["artifacts"][0]["base64"]
-            image_path = os.path.join(self.output_dir, f"scene_{int(time.time())}.png")
-            
-            with open(image_path, "wb") as f:
-                f.write(base64.b64decode(image_data))
-                
-            return image_path
-            
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Image generation failed: {str(e)}")
+        self._rate_limiter.acquire()
+        response = self.session.post(
+            self._text_to_image_url,
+            headers=headers,
+            data=_json_dumps(data),
+            stream=samples == 1
+        )
+        response.raise_for_status()
+        
+        if samples == 1:
+            # Raw PNG responses report the outcome in a header
+            finish_reason = response.headers.get("Finish-Reason", "SUCCESS")
+            if finish_reason != "SUCCESS":
+                raise Exception(f"Image generation failed: finish reason {finish_reason}")
+            _write_atomic(image_paths[0], response.iter_content(chunk_size=65536))
+            return
+        
+        # Validate the whole batch before caching any of it, so filtered or
+        # missing samples are never stored as if they were good images
+        artifacts = _json_loads(response.content)["artifacts"]
+        if len(artifacts) != samples:
+            raise Exception(
+                f"Image generation failed: expected {samples} images, got {len(artifacts)}"
+            )
+        for artifact in artifacts:
+            finish_reason = artifact.get("finishReason", "SUCCESS")
+            if finish_reason != "SUCCESS":
+                raise Exception(f"Image generation failed: finish reason {finish_reason}")
+        
+        for image_path, artifact in zip(image_paths, artifacts):
+            _write_atomic(image_path, [base64.b64decode(artifact["base64"])])
     
     def create_animation(
         self, 
@@ -103,88 +556,217 @@ class StabilityAnimationGenerator:
     ) -> str:
         """Create animation from script using Stability AI generated images."""
         scenes = self._parse_script(script)
-        clips = []
+        output_path = os.path.join(self.output_dir, output_filename)
+        scene_images = self._iter_scene_images(scenes, resolution)
         
-        for scene in scenes:
-            try:
-                # Generate scene image
-                scene_image_path = self.generate_scene_image(
-                    scene["description"], 
-                    resolution=resolution
-                )
-                
-                # Create base clip from image
-                scene_duration = max(len(scene["actions"]) * 3, 5)  # Minimum 5 seconds
-                scene_clip = ImageClip(scene_image_path).set_duration(scene_duration)
+        # A run where no image could be generated is not a rendering problem
+        first_image = next(scene_images, None)
+        if first_image is None:
+            raise Exception("No scenes were successfully generated")
+        scene_images = itertools.chain([first_image], scene_images)
+        
+        # Remember the images handed to ffmpeg so MoviePy can pick them up
+        # (along with any still downloading) if the direct render fails
+        seen_images = []
+        
+        def track(images):
+            for item in images:
+                seen_images.append(item)
+                yield item
+        
+        try:
+            self._render_with_ffmpeg(track(scene_images), output_path, resolution, fps)
+        except Exception as e:
+            print(f"ffmpeg rendering failed, falling back to MoviePy: {str(e)}")
+            self._render_with_moviepy(
+                itertools.chain(seen_images, scene_images), output_path, resolution, fps
+            )
+        
+        return output_path
+    
+    def _iter_scene_images(self, scenes: List[dict], resolution: Tuple[int, int]):
+        """Yield (index, scene, image_path) as soon as each scene's image is ready.
+        
+        Scenes arrive in completion order so downstream rendering can start on
+        whichever image finishes first; `index` restores script order.
+        """
+        # Each group of scenes sharing a description goes to one batch call,
+        # which numbers the repeats and splits them into requests itself
+        batches = {}
+        for i, scene in enumerate(scenes):
+            batches.setdefault(scene["description"], []).append(i)
+        
+        # Request all scene images concurrently; the work is network bound
+        with ThreadPoolExecutor(max_workers=MAX_IMAGE_WORKERS) as executor:
+            batch_futures = {
+                executor.submit(
+                    self.generate_scene_images_batch,
+                    [scenes[i]["description"] for i in batch],
+                    resolution
+                ): batch
+                for batch in batches.values()
+            }
+        
+            for future in as_completed(batch_futures):
+                batch = batch_futures[future]
+                try:
+                    image_paths = future.result()
+                except Exception as e:
+                    print(f"Error processing scenes {batch}: {str(e)}")
+                    continue
                 
-                # Add text overlays for actions
-                text_clips = []
-                for i, action in enumerate(scene["actions"]):
-                    text_clip = TextClip(
-                        action,
-                        fontsize=30,
-                        color='white',
-                        bg_color='rgba(0,0,0,0.5)',
-                        size=(resolution[0] - 100, None)
-                    ).set_position(('center', 'bottom'))
-                    
-                    text_clip = text_clip.set_start(i * 3).set_duration(3)
-                    text_clips.append(text_clip)
+                for i, image_path in zip(batch, image_paths):
+                    yield i, scenes[i], image_path
+    
+    def _render_with_ffmpeg(
+        self,
+        scene_images,
+        output_path: str,
+        resolution: Tuple[int, int],
+        fps: int
+    ):
+        """Render each scene with ffmpeg directly and stream-copy them together."""
+        with tempfile.TemporaryDirectory(dir=self.output_dir) as work_dir:
+            caption_width = resolution[0] - CAPTION_MARGIN
+            
+            # Pick the encoder once so every scene is encoded identically, as
+            # stream-copy concatenation requires. NVENC is limited by the GPU's
+            # session cap; libx264 splits the CPU threads between processes.
+            use_nvenc = _nvenc_available()
+            cpu_count = os.cpu_count() or 1
+            max_workers = min(NVENC_MAX_SESSIONS, cpu_count) if use_nvenc else cpu_count
+            encoder_args = _ffmpeg_encoder_args(
+                use_nvenc, threads=max(1, cpu_count // max_workers)
+            )
+            
+            # Each scene is its own ffmpeg process, so threads only wait on them
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # Renders start while later images are still downloading
+                renders = {}
+                for i, scene, scene_image_path in scene_images:
+                    scene_path = os.path.join(work_dir, f"scene_{i}.mp4")
+                    render_args = (
+                        scene_image_path,
+                        scene["actions"],
+                        _scene_duration(scene),
+                        scene_path,
+                        fps,
+                        caption_width,
+                        encoder_args
+                    )
+                    future = executor.submit(_render_scene_ffmpeg, *render_args)
+                    renders[i] = (scene_path, render_args, future)
                 
-                # Combine scene and text
-                scene_with_text = CompositeVideoClip(
-                    [scene_clip] + text_clips,
-                    size=resolution
+                scene_paths = []
+                for i in sorted(renders):
+                    scene_path, render_args, future = renders[i]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        # Retry once (e.g. a transient encoder session shortage);
+                        # if it still fails, raise rather than drop the scene so
+                        # the caller can fall back to MoviePy for the whole video
+                        print(f"Error rendering scene {i}, retrying: {str(e)}")
+                        try:
+                            _render_scene_ffmpeg(*render_args)
+                        except Exception as e:
+                            raise Exception(f"Scene {i} failed to render: {str(e)}")
+                    scene_paths.append(scene_path)
+            
+            if not scene_paths:
+                raise Exception("No scenes were successfully generated")
+            
+            _concat_videos_ffmpeg(scene_paths, output_path)
+    
+    def _render_with_moviepy(
+        self,
+        scene_images,
+        output_path: str,
+        resolution: Tuple[int, int],
+        fps: int
+    ):
+        """Compose and encode the scenes with MoviePy (used when direct ffmpeg rendering fails)."""
+        caption_width = resolution[0] - CAPTION_MARGIN
+        scene_clips = {}
+        for i, scene, scene_image_path in scene_images:
+            try:
+                scene_clips[i] = self._build_scene_clip(
+                    scene, scene_image_path, resolution, caption_width
                 )
-                clips.append(scene_with_text)
-                
             except Exception as e:
                 print(f"Error processing scene: {str(e)}")
                 continue
         
+        clips = [scene_clips[i] for i in sorted(scene_clips)]
         if not clips:
             raise Exception("No scenes were successfully generated")
             
         # Combine all scenes
         final_video = concatenate_videoclips(clips)
-        output_path = os.path.join(self.output_dir, output_filename)
         
         # Write final video
         final_video.write_videofile(
             output_path,
             fps=fps,
-            codec='libx264'
+            **_video_encoder_params()
         )
         
         # Cleanup
         for clip in clips:
             clip.close()
         final_video.close()
+    
+    def _build_scene_clip(
+        self,
+        scene: dict,
+        scene_image_path: str,
+        resolution: Tuple[int, int],
+        caption_width: int
+    ):
+        """Build a scene clip with its action captions burned into the frames."""
+        scene_duration = _scene_duration(scene)
+        actions = scene["actions"]
         
-        return output_path
+        # Captions never overlap, so every caption slot is a single static frame.
+        # It is composited when playback enters the slot and only the current
+        # slot's frame is kept, so a clip holds one frame rather than all of them.
+        current = {"slot": None, "frame": None}
+        
+        def make_frame(t):
+            slot = min(int(t // CAPTION_DURATION), len(actions))
+            if slot != current["slot"]:
+                background = _load_scene_background(scene_image_path, resolution)
+                if slot < len(actions):
+                    caption = _render_caption_image(actions[slot], caption_width)
+                    frame = _burn_caption(background, caption)
+                else:
+                    frame = np.array(background.convert("RGB"))
+                current.update(slot=slot, frame=frame)
+            return current["frame"]
+        
+        return VideoClip(make_frame, duration=scene_duration)
     
     def _parse_script(self, script: str) -> List[dict]:
         """Parse the animation script into scenes."""
         scenes = []
         current_scene = {"description": "", "characters": [], "actions": []}
         
-        for line in script.strip().split('\n'):
-            line = line.strip()
-            if not line:
-                continue
-                
-            if line.startswith('SCENE:'):
+        # Blank lines match no alternative and comments match without a group
+        for match in SCRIPT_LINE_PATTERN.finditer(script):
+            scene, character, action = match.group("scene", "character", "action")
+            
+            if scene is not None:
                 if current_scene["description"]:
                     scenes.append(current_scene)
                 current_scene = {
-                    "description": line[6:].strip(),
+                    "description": scene.strip(),
                     "characters": [],
                     "actions": []
                 }
-            elif line.startswith('CHARACTER:'):
-                current_scene["characters"].append(line[10:].strip())
-            elif not line.startswith(('#', '//')):
-                current_scene["actions"].append(line)
+            elif character is not None:
+                current_scene["characters"].append(character.strip())
+            elif action is not None:
+                current_scene["actions"].append(action)
                 
         if current_scene["description"]:
             scenes.append(current_scene)
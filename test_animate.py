@@ -0,0 +1,302 @@
+import base64
+import json
+import os
+from unittest import mock
+
+import pytest
+from PIL import Image
+
+import animate
+from animate import StabilityAnimationGenerator
+
+
+class _FakeResponse:
+    def __init__(self, content: bytes = b"", headers: dict = None, chunks=()):
+        self.content = content
+        self.headers = headers or {}
+        self._chunks = chunks
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=1):
+        for chunk in self._chunks:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+
+def test_repeated_prompt_beyond_batch_size_gets_distinct_images(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    generator = StabilityAnimationGenerator()
+    monkeypatch.setattr(generator, "_api_healthy", lambda: True)
+
+    counter = iter(range(1000))
+    requested_samples = []
+
+    def fake_post(url, headers=None, data=None, stream=False):
+        samples = json.loads(data)["samples"]
+        requested_samples.append(samples)
+        if samples == 1:
+            raise AssertionError("expected multi-sample requests only")
+        artifacts = [
+            {"base64": base64.b64encode(f"image-{next(counter)}".encode()).decode()}
+            for _ in range(samples)
+        ]
+        return _FakeResponse(json.dumps({"artifacts": artifacts}).encode())
+
+    scenes = [{"description": "aa", "characters": [], "actions": []}] * 6
+    with mock.patch.object(generator.session, "post", side_effect=fake_post):
+        results = sorted(generator._iter_scene_images(scenes, (1024, 1024)))
+
+    assert sorted(requested_samples) == [2, 4]
+    assert [i for i, _, _ in results] == list(range(6))
+
+    paths = [path for _, _, path in results]
+    assert len(set(paths)) == 6
+    contents = set()
+    for path in paths:
+        with open(path, "rb") as f:
+            contents.add(f.read())
+    assert len(contents) == 6
+
+
+def test_moviepy_fallback_receives_all_scene_images(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    generator = StabilityAnimationGenerator()
+    scene_images = [(i, {"actions": []}, f"scene_{i}.png") for i in range(3)]
+    monkeypatch.setattr(
+        generator, "_iter_scene_images", lambda scenes, resolution: iter(scene_images)
+    )
+
+    def failing_ffmpeg(images, output_path, resolution, fps):
+        next(images)
+        next(images)
+        raise Exception("encoder not found")
+
+    received = []
+    monkeypatch.setattr(generator, "_render_with_ffmpeg", failing_ffmpeg)
+    monkeypatch.setattr(
+        generator,
+        "_render_with_moviepy",
+        lambda images, output_path, resolution, fps: received.extend(images)
+    )
+
+    generator.create_animation("SCENE: a", "out.mp4")
+
+    assert received == scene_images
+
+
+def _patch_scene_renderer(monkeypatch, failures):
+    """Make each scene file fail `failures[name]` times; returns the concat input."""
+    attempts = {}
+    concatenated = []
+
+    def fake_render(png_path, actions, duration, out_path, fps, caption_width, encoder_args):
+        scene = os.path.basename(out_path)
+        attempts[scene] = attempts.get(scene, 0) + 1
+        if attempts[scene] <= failures.get(scene, 0):
+            raise Exception("out of encoder sessions")
+
+    monkeypatch.setattr(animate, "_nvenc_available", lambda: False)
+    monkeypatch.setattr(animate, "_render_scene_ffmpeg", fake_render)
+    monkeypatch.setattr(
+        animate,
+        "_concat_videos_ffmpeg",
+        lambda paths, out_path: concatenated.extend(os.path.basename(p) for p in paths)
+    )
+    return concatenated
+
+
+def test_ffmpeg_render_retries_a_failed_scene(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    generator = StabilityAnimationGenerator()
+    concatenated = _patch_scene_renderer(monkeypatch, {"scene_1.mp4": 1})
+    scene_images = [(i, {"actions": []}, f"scene_{i}.png") for i in range(3)]
+
+    generator._render_with_ffmpeg(iter(scene_images), "out.mp4", (1024, 1024), 24)
+
+    assert concatenated == ["scene_0.mp4", "scene_1.mp4", "scene_2.mp4"]
+
+
+def test_ffmpeg_render_raises_instead_of_dropping_a_scene(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    generator = StabilityAnimationGenerator()
+    concatenated = _patch_scene_renderer(monkeypatch, {"scene_1.mp4": 2})
+    scene_images = [(i, {"actions": []}, f"scene_{i}.png") for i in range(3)]
+
+    with pytest.raises(Exception, match="Scene 1 failed to render"):
+        generator._render_with_ffmpeg(iter(scene_images), "out.mp4", (1024, 1024), 24)
+    assert concatenated == []
+
+
+def test_scene_clip_burns_each_caption_into_its_slot(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    generator = StabilityAnimationGenerator()
+    image_path = str(tmp_path / "scene.png")
+    Image.new("RGB", (256, 256), (0, 128, 255)).save(image_path)
+    scene = {"description": "sky", "characters": [], "actions": ["one", "two"]}
+
+    clip = generator._build_scene_clip(scene, image_path, (256, 256), caption_width=156)
+
+    assert clip.duration == 6
+    first, second = clip.get_frame(1), clip.get_frame(4)
+    assert first.shape == (256, 256, 3)
+    # Captions darken the bottom of the frame and differ between slots
+    assert (first[-1] != [0, 128, 255]).any()
+    assert (first != second).any()
+    assert (first[:100] == [0, 128, 255]).all()
+
+
+def _batch_response(*finish_reasons):
+    artifacts = [
+        {"base64": base64.b64encode(b"png").decode(), "finishReason": reason}
+        for reason in finish_reasons
+    ]
+    return _FakeResponse(json.dumps({"artifacts": artifacts}).encode())
+
+
+@pytest.mark.parametrize(
+    "response, samples, message",
+    [
+        (_batch_response("SUCCESS", "CONTENT_FILTERED"), 2, "CONTENT_FILTERED"),
+        (_batch_response("SUCCESS"), 2, "expected 2 images, got 1"),
+        (_FakeResponse(headers={"Finish-Reason": "CONTENT_FILTERED"}), 1, "CONTENT_FILTERED"),
+        (_FakeResponse(chunks=[b"partial", OSError("connection reset")]), 1, "connection reset"),
+    ]
+)
+def test_failed_image_requests_leave_nothing_in_cache(
+    tmp_path, monkeypatch, response, samples, message
+):
+    monkeypatch.chdir(tmp_path)
+    generator = StabilityAnimationGenerator()
+    image_paths = [generator._cache_path("aa", (1024, 1024), i) for i in range(samples)]
+
+    with mock.patch.object(generator.session, "post", return_value=response):
+        with pytest.raises(Exception, match=message):
+            generator._request_images("aa", (1024, 1024), image_paths)
+
+    assert os.listdir(generator.cache_dir) == []
+
+
+def test_caption_font_fallback_keeps_requested_size(monkeypatch):
+    monkeypatch.setattr(animate, "CAPTION_FONT", "no-such-font.ttf")
+    animate._caption_font.cache_clear()
+    try:
+        assert animate._caption_font(30).size == 30
+    finally:
+        animate._caption_font.cache_clear()
+
+
+def test_no_scene_images_skips_rendering(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    generator = StabilityAnimationGenerator()
+    monkeypatch.setattr(generator, "_iter_scene_images", lambda scenes, resolution: iter([]))
+    renderer = mock.Mock()
+    monkeypatch.setattr(generator, "_render_with_ffmpeg", renderer)
+    monkeypatch.setattr(generator, "_render_with_moviepy", renderer)
+
+    with pytest.raises(Exception, match="No scenes were successfully generated"):
+        generator.create_animation("SCENE: a", "out.mp4")
+    renderer.assert_not_called()
+
+
+def test_failed_status_check_is_cached_briefly(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    generator = StabilityAnimationGenerator()
+    results = iter([False, True])
+    monkeypatch.setattr(generator, "check_api_status", lambda: next(results))
+    monkeypatch.setattr(generator, "check_components_status", lambda: True)
+    now = [1000.0]
+    monkeypatch.setattr(animate.time, "time", lambda: now[0])
+
+    assert generator._api_healthy() is False
+    now[0] += animate.STATUS_FAILURE_TTL - 1
+    assert generator._api_healthy() is False
+    now[0] += 2
+    assert generator._api_healthy() is True
+    now[0] += animate.STATUS_CACHE_TTL - 1
+    assert generator._api_healthy() is True
+
+
+def test_parse_script_handles_comments_whitespace_and_empty_scenes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    generator = StabilityAnimationGenerator()
+    script = (
+        "stray action before any scene\r\n"
+        "  SCENE:  A forest  \r\n"
+        "\r\n"
+        "# a comment\r\n"
+        "   // another comment\r\n"
+        "\tCHARACTER: Wizard \r\n"
+        "    The wizard waves\r\n"
+        "SCENE:\r\n"
+        "Dropped with the empty scene\r\n"
+        "SCENE: A cave\n"
+        "   \n"
+        "CHARACTER:Bat\n"
+        "Bats fly # not a comment\n"
+    )
+
+    assert generator._parse_script(script) == [
+        {
+            "description": "A forest",
+            "characters": ["Wizard"],
+            "actions": ["The wizard waves"]
+        },
+        {
+            "description": "A cave",
+            "characters": ["Bat"],
+            "actions": ["Bats fly # not a comment"]
+        },
+    ]
+
+
+def test_rate_limiter_allows_a_burst_then_paces_requests(monkeypatch):
+    now = [0.0]
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr(animate.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(animate.time, "sleep", fake_sleep)
+    limiter = animate._RateLimiter(rate=2)
+
+    limiter.acquire()
+    limiter.acquire()
+    assert sleeps == []
+
+    limiter.acquire()
+    assert sleeps == [pytest.approx(0.5)]
+
+    # Idle time refills the bucket, but never beyond its capacity
+    now[0] += 10
+    for _ in range(3):
+        limiter.acquire()
+    assert sleeps == [pytest.approx(0.5), pytest.approx(0.5)]
+
+
+def test_render_scene_ffmpeg_times_each_caption(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(animate, "_run_ffmpeg", calls.append)
+    out_path = str(tmp_path / "scene.mp4")
+
+    animate._render_scene_ffmpeg(
+        "scene.png", ["one", "two"], 6, out_path, 24, 156, ["-c:v", "libx264"]
+    )
+
+    (args,) = calls
+    assert args[:8] == ["-loop", "1", "-framerate", "1", "-t", "6", "-i", "scene.png"]
+    assert args[8:12] == ["-i", f"{out_path}.caption_0.png", "-i", f"{out_path}.caption_1.png"]
+    assert os.path.exists(f"{out_path}.caption_1.png")
+
+    filters = args[args.index("-filter_complex") + 1].split(";")
+    assert filters == [
+        "[0:v]fps=24[v0]",
+        "[v0][1:v]overlay=x=(W-w)/2:y=H-h:enable='gte(t,0)*lt(t,3)'[v1]",
+        "[v1][2:v]overlay=x=(W-w)/2:y=H-h:enable='gte(t,3)*lt(t,6)'[v2]",
+        "[v2]format=yuv420p[out]",
+    ]
+    assert args[-3:] == ["-c:v", "libx264", out_path]